@@ -0,0 +1,99 @@
+"""Payload size and serialization time for GET /todos response shapes.
+
+Run from the backend directory:
+
+    python -m benchmarks.todo_payloads --todos 5000
+"""
+
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+# The app reads its database URL at import time, so point it at a scratch file first
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+
+from src.database import Base, SessionLocal, init_engine  # noqa: E402
+from src.models import Project, Tag, Todo, User  # noqa: E402
+from src.serialization import apply_todo_fields, parse_fields, serialize_todos  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def seed(todo_count: int, tag_count: int) -> str:
+    Base.metadata.create_all(bind=init_engine())
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com", password="x")
+    db.add(user)
+    db.flush()
+    project = Project(name="Bench", description="A project shared by every todo", user_id=user.id)
+    tags = [Tag(name=f"tag-{i}", user_id=user.id) for i in range(tag_count)]
+    db.add(project)
+    db.add_all(tags)
+    db.flush()
+    for i in range(todo_count):
+        todo = Todo(title=f"Todo {i}", description="Something to do", project_id=project.id, user_id=user.id)
+        todo.tags = tags[i % tag_count : i % tag_count + 2]
+        db.add(todo)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def run_case(user_id: str, fields: str, sideload: bool, repeat: int):
+    best = None
+    for _ in range(repeat):
+        db = SessionLocal()
+        start = time.perf_counter()
+        selected = parse_fields(fields)
+        query = apply_todo_fields(db.query(Todo).filter(Todo.user_id == user_id), selected)
+        todos = query.all()
+        loaded = time.perf_counter()
+        body = serialize_todos(todos, selected, sideload)
+        done = time.perf_counter()
+        db.close()
+        timing = (loaded - start, done - loaded)
+        if best is None or sum(timing) < sum(best):
+            best = timing
+    return body, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--todos", type=int, default=5000)
+    parser.add_argument("--tags", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    user_id = seed(args.todos, args.tags)
+    cases = [
+        ("inline (default)", None, False),
+        ("inline, fields", "id,title,is_completed,due_date,project", False),
+        ("sideload", None, True),
+        ("sideload, fields", "id,title,is_completed,due_date,project,tags", True),
+        ("columns only", "id,title,is_completed", False),
+    ]
+
+    header = f"{'case':<20} {'query ms':>9} {'serialize ms':>13} {'raw bytes':>11} {'gzip bytes':>11}"
+    if brotli is not None:
+        header += f" {'br bytes':>10}"
+    print(f"{args.todos} todos, {args.tags} tags")
+    print(header)
+    for name, fields, sideload in cases:
+        body, (query_time, serialize_time) = run_case(user_id, fields, sideload, args.repeat)
+        line = (
+            f"{name:<20} {query_time * 1000:>9.1f} {serialize_time * 1000:>13.1f} "
+            f"{len(body):>11} {len(gzip.compress(body, compresslevel=6)):>11}"
+        )
+        if brotli is not None:
+            line += f" {len(brotli.compress(body, quality=4)):>10}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
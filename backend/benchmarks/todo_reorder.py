@@ -0,0 +1,113 @@
+"""Cost of drag-and-drop reorders with fractional-index positions.
+
+Run from the backend directory:
+
+    python -m benchmarks.todo_reorder --todos 50000 --moves 10000
+"""
+
+import argparse
+import bisect
+import os
+import random
+import tempfile
+import time
+
+# The app reads its database URL at import time, so point it at a scratch file first
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from src import ordering  # noqa: E402
+from src.database import Base, SessionLocal, init_engine  # noqa: E402
+from src.models import Project, Todo, User  # noqa: E402
+
+
+def seed(todo_count: int) -> str:
+    Base.metadata.create_all(bind=init_engine())
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com", password="x")
+    db.add(user)
+    db.flush()
+    project = Project(name="Bench", user_id=user.id)
+    db.add(project)
+    db.flush()
+    keys = ordering.keys_between(None, None, todo_count)
+    db.execute(
+        insert(Todo),
+        [
+            {"title": f"Todo {i}", "project_id": project.id, "user_id": user.id, "position": key}
+            for i, key in enumerate(keys)
+        ],
+    )
+    db.commit()
+    project_id = project.id
+    db.close()
+    return project_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--todos", type=int, default=50000)
+    parser.add_argument("--moves", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    project_id = seed(args.todos)
+
+    updates = 0
+
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        nonlocal updates
+        if statement.startswith("UPDATE todos"):
+            updates += 1
+
+    event.listen(init_engine(), "before_cursor_execute", count_updates)
+
+    db = SessionLocal()
+    rows = db.query(Todo.id, Todo.position).filter(Todo.project_id == project_id).order_by(Todo.position).all()
+    ids = [row.id for row in rows]
+    keys = [row.position for row in rows]
+    integer_rewrites = 0
+
+    start = time.perf_counter()
+    for _ in range(args.moves):
+        todo = db.get(Todo, random.choice(ids))
+        anchor = db.get(Todo, random.choice(ids))
+        if anchor.id == todo.id:
+            continue
+
+        old_index = bisect.bisect_left(keys, todo.position)
+        if random.random() < 0.5:
+            position = ordering.position_for_move(db, todo, anchor, None)
+        else:
+            position = ordering.position_for_move(db, todo, None, anchor)
+        todo.position = position
+        db.commit()
+
+        # Rows an integer `position` column would have had to shift for the same move
+        del keys[old_index]
+        new_index = bisect.bisect_left(keys, position)
+        keys.insert(new_index, position)
+        integer_rewrites += abs(new_index - old_index) + 1
+    elapsed = time.perf_counter() - start
+    move_updates = updates
+
+    longest = max(len(key) for key in keys)
+    start = time.perf_counter()
+    ordering.rebalance_project(db, project_id)
+    rebalance_time = time.perf_counter() - start
+    longest_after = db.query(Todo.position).filter(Todo.project_id == project_id).all()
+    db.close()
+
+    print(f"{args.todos} todos, {args.moves} moves")
+    print(f"moves:                 {elapsed * 1000:.0f} ms total, {elapsed / args.moves * 1e6:.0f} us/move")
+    print(f"UPDATE statements:     {move_updates} ({move_updates / args.moves:.2f} per move)")
+    print(f"integer-column rows:   {integer_rewrites} ({integer_rewrites / args.moves:.0f} per move)")
+    print(f"longest key:           {longest} chars")
+    print(f"rebalance:             {rebalance_time * 1000:.0f} ms, longest key after {max(len(r.position) for r in longest_after)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,202 @@
+"""Run the API.
+
+    python run.py                 development server with auto-reload
+    python run.py serve           production: one preloaded worker per core
+    python run.py profile         report where import and startup time goes
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
 import uvicorn
 
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def dev(args):
+    uvicorn.run("src.main:app", host=args.host, port=args.port, reload=True)
+
+
+def prepare_database():
+    """Create tables once in the parent process, so workers don't race each other doing it."""
+    from src import database, models  # noqa: F401 (registers the tables)
+    from src.config import settings
+
+    if settings.DB_CREATE_ALL:
+        database.Base.metadata.create_all(bind=database.init_engine())
+        database.dispose_engine()
+
+    # Workers inherit both: the settings object when forked, the environment when spawned
+    settings.DB_CREATE_ALL = False
+    os.environ["DB_CREATE_ALL"] = "false"
+
+
+def share_state_between_workers(workers: int):
+    """Keep idempotency keys and rate limit buckets in the database when there are several
+    workers; in memory, a retry on another worker runs again and each worker has its own buckets."""
+    from src.config import settings
+
+    if workers <= 1:
+        return
+    for name in ("IDEMPOTENCY_BACKEND", "RATE_LIMIT_BACKEND"):
+        if getattr(settings, name) != "memory":
+            continue
+        if name in settings.model_fields_set:
+            print(f"Warning: {name}=memory is not shared between the {workers} workers", file=sys.stderr)
+            continue
+        # Set before src.main is imported, and inherited by the workers like DB_CREATE_ALL
+        setattr(settings, name, "database")
+        os.environ[name] = "database"
+
+
+def serve(args):
+    from src.config import settings
+
+    workers = args.workers or settings.WEB_CONCURRENCY or usable_cores()
+    share_state_between_workers(workers)
+    prepare_database()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # Without gunicorn, uvicorn's supervisor imports the app separately in each worker
+        uvicorn.run("src.main:app", host=args.host, port=args.port, workers=workers, proxy_headers=True)
+        return
+
+    # Imported once here and forked into the workers; engines and pools are created
+    # per worker by the app lifespan
+    from src.main import app
+
+    class Server(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server(
+        {
+            "bind": f"{args.host}:{args.port}",
+            "workers": workers,
+            "worker_class": "uvicorn.workers.UvicornWorker",
+            "preload_app": True,
+        }
+    ).run()
+
+
+def import_times(top: int):
+    """Import `src.main` in a fresh interpreter with -X importtime and return the slowest modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+
+    total = sum(cumulative for _, depth, _, cumulative in modules if depth == 0)
+    # Self times summed per root package attribute every module to whoever ships it
+    packages = {}
+    for name, _, self_us, _ in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    by_package = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    by_self = sorted(modules, key=lambda module: module[2], reverse=True)[:top]
+    return total, by_package, by_self
+
+
+async def run_lifespan(app):
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter() - start
+        timings = dict(app.state.startup_timings)
+        start = time.perf_counter()
+    return started, timings, time.perf_counter() - start
+
+
+def isolate_profile(database_url):
+    """Keep the profiled startup from touching real data: a scratch SQLite database unless
+    one is given (then left unmodified), and no background scheduler or activity log."""
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["DB_CREATE_ALL"] = "false"
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/profile.db"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["ACTIVITY_LOG_ENABLED"] = "false"
+
+
+def profile(args):
+    # Settings are read at import, so this has to happen before anything imports src
+    isolate_profile(args.database_url)
+    total, by_package, by_self = import_times(args.top)
+    print(f"Cold import of src.main: {total / 1000:.1f} ms (fresh interpreter, -X importtime)")
+    print("\nBy package (self time of all its modules):")
+    for package, self_us in by_package:
+        print(f"  {self_us / 1000:>8.1f} ms  {package}")
+    print("\nSlowest modules (self):")
+    for name, _, self_us, _ in by_self:
+        print(f"  {self_us / 1000:>8.1f} ms  {name}")
+
+    start = time.perf_counter()
+    from src.main import app
+
+    imported = time.perf_counter() - start
+    started, timings, stopped = asyncio.run(run_lifespan(app))
+    print(f"\nImport in this process: {imported * 1000:.1f} ms")
+    print(f"Lifespan startup: {started * 1000:.1f} ms")
+    for name, seconds in timings.items():
+        print(f"  {seconds * 1000:>8.1f} ms  {name}")
+    print(f"Lifespan shutdown: {stopped * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Todo App API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.set_defaults(command=dev)
+    commands = parser.add_subparsers()
+
+    serve_parser = commands.add_parser("serve", help="production server with preloaded workers")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--workers", type=int, help="defaults to WEB_CONCURRENCY or the number of cores")
+    serve_parser.set_defaults(command=serve)
+
+    profile_parser = commands.add_parser("profile", help="report import and startup time")
+    profile_parser.add_argument("--top", type=int, default=15)
+    profile_parser.add_argument(
+        "--database-url", help="database to time connections against (default: a scratch SQLite file)"
+    )
+    profile_parser.set_defaults(command=profile)
+
+    args = parser.parse_args()
+    args.command(args)
+
+
 if __name__ == "__main__":
-    uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=True)
+    main()
@@ -0,0 +1,244 @@
+"""Activity log of changes to todos, projects and tags.
+
+Diffs are captured from session flush events and queued once the transaction commits;
+a background task writes them in multi-row inserts, so mutations never wait on the log.
+History is therefore eventually consistent, lagging by up to one flush interval.
+"""
+
+import asyncio
+import enum
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import NO_VALUE, Session
+from starlette.concurrency import run_in_threadpool
+
+from . import database
+from .config import settings
+from .models import ActivityLog, Project, Tag, Todo
+
+logger = logging.getLogger(__name__)
+
+TRACKED = {Todo: "todo", Project: "project", Tag: "tag"}
+IGNORED_FIELDS = {"created_at", "updated_at"}
+
+
+def _jsonable(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _snapshot(obj, new: bool) -> dict:
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        if attr.key in IGNORED_FIELDS:
+            continue
+        value = state.attrs[attr.key].loaded_value
+        if value is NO_VALUE or value is None:
+            continue
+        value = _jsonable(value)
+        changes[attr.key] = {"old": None, "new": value} if new else {"old": value, "new": None}
+    return changes
+
+
+def _diff(obj) -> dict:
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        if attr.key in IGNORED_FIELDS:
+            continue
+        history = state.attrs[attr.key].history
+        if not history.added:
+            continue
+        old = _jsonable(history.deleted[0]) if history.deleted else None
+        new = _jsonable(history.added[0])
+        if old != new:
+            changes[attr.key] = {"old": old, "new": new}
+    return changes
+
+
+def _entry(obj, action: str, changes: dict) -> dict:
+    return {
+        "entity_type": TRACKED[type(obj)],
+        "entity_id": obj.id,
+        "user_id": obj.user_id,
+        "action": action,
+        "changes": json.dumps(changes),
+        "created_at": datetime.utcnow(),
+    }
+
+
+class ActivityLogger:
+    def __init__(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def enqueue(self, entries: List[dict]):
+        """Queue committed entries; may be called from any thread."""
+        if not self.running or not entries:
+            return
+
+        overflow = None
+        with self._lock:
+            free = settings.ACTIVITY_QUEUE_SIZE - len(self._queue)
+            if len(entries) > free:
+                if settings.ACTIVITY_OVERFLOW_POLICY == "flush":
+                    # Backpressure: the producer writes the backlog itself before queueing more
+                    overflow = list(self._queue)
+                    self._queue.clear()
+                else:
+                    self.dropped += len(entries) - max(free, 0)
+                    entries = entries[: max(free, 0)]
+            self._queue.extend(entries)
+            size = len(self._queue)
+
+        if overflow:
+            try:
+                self._write(overflow)
+            except Exception:
+                # The queue is already full, so there's no room to put these back
+                logger.exception("Failed to write activity log backlog")
+                with self._lock:
+                    self.dropped += len(overflow)
+        if size >= settings.ACTIVITY_BATCH_SIZE:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Write whatever is still queued
+        try:
+            await run_in_threadpool(self.flush)
+        except Exception:
+            logger.exception("Failed to write activity log")
+            with self._lock:
+                self.dropped += len(self._queue)
+                self._queue.clear()
+        self._report_dropped()
+
+    def flush(self):
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            try:
+                self._write(batch)
+            except Exception:
+                self._requeue(batch)
+                raise
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.ACTIVITY_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:
+                # The batch went back on the queue and is retried on the next pass
+                logger.exception("Failed to write activity log")
+            self._report_dropped()
+
+    def _report_dropped(self):
+        dropped = self.dropped - self._reported_dropped
+        if dropped:
+            self._reported_dropped = self.dropped
+            logger.warning("Dropped %d activity log entries (%d since startup)", dropped, self.dropped)
+
+    def _take(self) -> List[dict]:
+        with self._lock:
+            count = min(len(self._queue), settings.ACTIVITY_BATCH_SIZE)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _requeue(self, batch: List[dict]):
+        # Back at the front so entries keep their order; whatever no longer fits is dropped
+        with self._lock:
+            free = max(settings.ACTIVITY_QUEUE_SIZE - len(self._queue), 0)
+            self.dropped += max(len(batch) - free, 0)
+            self._queue.extendleft(reversed(batch[:free]))
+
+    def _write(self, entries: List[dict]):
+        db = database.SessionLocal()
+        try:
+            for start in range(0, len(entries), settings.ACTIVITY_BATCH_SIZE):
+                # One INSERT ... VALUES (...), (...) statement per batch
+                db.execute(insert(ActivityLog).values(entries[start : start + settings.ACTIVITY_BATCH_SIZE]))
+            db.commit()
+        finally:
+            db.close()
+
+
+activity_logger = ActivityLogger()
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+def _track_old_values():
+    # Objects are expired on commit, and setting an expired attribute wouldn't otherwise load
+    # its old value, leaving _diff without one. Active history loads it first.
+    for model in TRACKED:
+        for attr in inspect(model).column_attrs:
+            event.listen(getattr(model, attr.key), "set", _load_old_value, active_history=True)
+
+
+_track_old_values()
+
+
+@event.listens_for(database.SessionLocal, "after_flush")
+def _capture(session: Session, flush_context):
+    if not activity_logger.running:
+        return
+    pending = session.info.setdefault("activity", [])
+    for obj in session.new:
+        if type(obj) in TRACKED:
+            pending.append(_entry(obj, "create", _snapshot(obj, new=True)))
+    for obj in session.dirty:
+        if type(obj) in TRACKED and session.is_modified(obj, include_collections=False):
+            changes = _diff(obj)
+            if changes:
+                pending.append(_entry(obj, "update", changes))
+    for obj in session.deleted:
+        if type(obj) in TRACKED:
+            pending.append(_entry(obj, "delete", _snapshot(obj, new=False)))
+
+
+@event.listens_for(database.SessionLocal, "after_commit")
+def _committed(session: Session):
+    activity_logger.enqueue(session.info.pop("activity", []))
+
+
+@event.listens_for(database.SessionLocal, "after_rollback")
+def _rolled_back(session: Session):
+    session.info.pop("activity", None)
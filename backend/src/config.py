@@ -8,6 +8,69 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Database pool, created per worker at startup. DB_POOL_WARMUP connections are opened up front.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP: int = 2
+    DB_CREATE_ALL: bool = True
+
+    # Worker processes for `run.py serve` (defaults to the number of usable cores)
+    WEB_CONCURRENCY: Optional[int] = None
+
+    # Response compression (brotli is used only when the `brotli` package is installed)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Idempotency-Key handling for mutating routes ("memory" or "database"). Memory isn't shared
+    # between workers, so `run.py serve` switches to "database" when it runs several, unless the
+    # backend was set explicitly. Responses are kept for IDEMPOTENCY_TTL_SECONDS; a key whose
+    # first request hasn't finished within IDEMPOTENCY_LOCK_TIMEOUT_SECONDS (e.g. its worker
+    # died) can be taken over by a retry.
+    IDEMPOTENCY_BACKEND: str = "memory"
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: int = 60
+    IDEMPOTENCY_WAIT_TIMEOUT_SECONDS: float = 30
+
+    # Token-bucket rate limits for /auth routes ("memory" or "database" backend, with the same
+    # multi-worker default as IDEMPOTENCY_BACKEND).
+    # Rates are tokens per second, bursts are the bucket size.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_AUTH_IP_RATE: float = 1.0
+    RATE_LIMIT_AUTH_IP_BURST: int = 20
+    RATE_LIMIT_AUTH_USER_RATE: float = 0.2
+    RATE_LIMIT_AUTH_USER_BURST: int = 5
+
+    # Load shedding: requests in flight before new ones get a 503 (0 disables)
+    LOAD_SHED_MAX_CONCURRENCY: int = 200
+    LOAD_SHED_AUTH_MAX_CONCURRENCY: int = 8
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 1
+
+    # Todo positions longer than this get their project rebalanced in the background
+    ORDERING_MAX_KEY_LENGTH: int = 32
+
+    # Due date scheduler: only the worker holding the lease scans
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LOOKAHEAD_SECONDS: int = 3600
+    SCHEDULER_DUE_SOON_SECONDS: int = 900
+    SCHEDULER_BATCH_SIZE: int = 1000
+    SCHEDULER_LEASE_SECONDS: int = 30
+    SCHEDULER_POLL_SECONDS: float = 10
+    SCHEDULER_RECONCILE_SECONDS: int = 300
+
+    # Activity log: queued changes are written in batches of ACTIVITY_BATCH_SIZE or every
+    # ACTIVITY_FLUSH_INTERVAL_SECONDS. A full queue either drops new entries ("drop") or makes
+    # the request that overflowed it write the backlog itself ("flush").
+    ACTIVITY_LOG_ENABLED: bool = True
+    ACTIVITY_QUEUE_SIZE: int = 10000
+    ACTIVITY_BATCH_SIZE: int = 500
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = 1.0
+    ACTIVITY_OVERFLOW_POLICY: str = "drop"
+
     class Config:
         env_file = ".env"
 
@@ -1,18 +1,63 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.ext.declarative import declared_attr
 from .config import settings
 
-# Use connect_args only for SQLite
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
-
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is created per worker process by init_engine(), called from the app lifespan,
+# so pooled connections are never shared across a fork. SessionLocal is bound to it then.
+engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
 
+def create_db_engine(url: str = None) -> Engine:
+    url = url or settings.DATABASE_URL
+
+    # Use connect_args only for SQLite
+    connect_args = {}
+    pool_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+    else:
+        pool_args = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+
+    return create_engine(url, connect_args=connect_args, **pool_args)
+
+
+def init_engine() -> Engine:
+    global engine
+    if engine is None:
+        engine = create_db_engine()
+        SessionLocal.configure(bind=engine)
+    return engine
+
+
+def warm_up(connections: int):
+    """Open `connections` pooled connections up front so the first requests don't pay for them."""
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = init_engine().connect()
+            connection.exec_driver_sql("SELECT 1")
+            opened.append(connection)
+    finally:
+        # Closing returns them to the pool, where they stay open
+        for connection in opened:
+            connection.close()
+
+
+def dispose_engine():
+    global engine
+    if engine is not None:
+        engine.dispose()
+        engine = None
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,334 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import database
+from .models import IdempotencyKey
+
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Rejections a retry is expected to get past (rate limited, still in progress, timed out)
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with this key did not finish in time."""
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    response: Optional[CachedResponse] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class MemoryIdempotencyStore:
+    """Bounded in-process LRU of idempotency keys and their responses."""
+
+    def __init__(
+        self, max_entries: int = 10000, ttl: float = 86400, lock_timeout: float = 60, wait_timeout: float = 30
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    async def acquire(self, key: str, fingerprint: str) -> Optional[CachedResponse]:
+        """Return the stored response for `key`, or None once the caller owns the key.
+
+        Concurrent duplicates wait for the owner to complete or release the key.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                # Held only for lock_timeout until a response is stored
+                self._entries[key] = _Entry(fingerprint=fingerprint, expires_at=time.monotonic() + self.lock_timeout)
+                self._evict()
+                return None
+
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+
+            if entry.response is not None:
+                self._entries.move_to_end(key)
+                return entry.response
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IdempotencyInProgress(key)
+            try:
+                await asyncio.wait_for(entry.done.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise IdempotencyInProgress(key)
+
+    async def complete(self, key: str, response: CachedResponse):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.response = response
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+
+    async def release(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+    def _evict(self):
+        # Drop the least recently used finished entries, in-flight keys are kept
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[key].response is not None:
+                del self._entries[key]
+
+
+class DatabaseIdempotencyStore:
+    """Idempotency keys kept in the `idempotency_keys` table, shared by every worker.
+
+    Rows of unfinished requests expire after `lock_timeout`, so a key left behind by a
+    crashed worker is taken over by the next retry. Expired rows are purged every
+    `purge_interval` seconds by whichever request comes along.
+    """
+
+    poll_interval = 0.1
+    purge_interval = 60
+
+    def __init__(self, ttl: float = 86400, lock_timeout: float = 60, wait_timeout: float = 30):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._next_purge = 0.0
+
+    async def acquire(self, key: str, fingerprint: str) -> Optional[CachedResponse]:
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            await run_in_threadpool(self._purge)
+
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            response, owned = await run_in_threadpool(self._try_acquire, key, fingerprint)
+            if owned or response is not None:
+                return response
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgress(key)
+            await asyncio.sleep(self.poll_interval)
+
+    async def complete(self, key: str, response: CachedResponse):
+        await run_in_threadpool(self._complete, key, response)
+
+    async def release(self, key: str):
+        await run_in_threadpool(self._release, key)
+
+    def _try_acquire(self, key: str, fingerprint: str) -> Tuple[Optional[CachedResponse], bool]:
+        db = database.SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now).delete()
+            db.add(
+                IdempotencyKey(key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=self.lock_timeout))
+            )
+            try:
+                db.commit()
+                return None, True
+            except IntegrityError:
+                db.rollback()
+
+            record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+            if record is None:
+                # Released between our insert and read, try again on the next poll
+                return None, False
+            if record.fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            if record.status_code is None:
+                return None, False
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(record.headers)]
+            return CachedResponse(record.status_code, headers, record.body), False
+        finally:
+            db.close()
+
+    def _complete(self, key: str, response: CachedResponse):
+        db = database.SessionLocal()
+        try:
+            headers = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response.headers]
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update(
+                {
+                    "status_code": response.status_code,
+                    "headers": json.dumps(headers),
+                    "body": response.body,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl),
+                }
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, key: str):
+        db = database.SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def _purge(self):
+        db = database.SessionLocal()
+        try:
+            # Served by the expires_at index
+            db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def request_fingerprint(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(scope["method"].encode())
+    digest.update(scope["path"].encode())
+    digest.update(scope.get("query_string", b""))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for mutating requests that repeat an `Idempotency-Key`.
+
+    Only paths under `path_prefixes` are handled (all paths when None); responses carrying
+    credentials, such as /auth/login tokens, must not be stored.
+    Keys are scoped to the caller's credentials, so two users can't collide.
+    Server errors and retryable rejections such as 429 are not stored, which lets the client retry them.
+    """
+
+    header_name = "idempotency-key"
+
+    def __init__(self, app: ASGIApp, store, path_prefixes: Optional[Sequence[str]] = None):
+        self.app = app
+        self.store = store
+        self.path_prefixes = tuple(path_prefixes) if path_prefixes is not None else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in IDEMPOTENT_METHODS
+            or (self.path_prefixes is not None and not scope["path"].startswith(self.path_prefixes))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(self.header_name)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        owner = hashlib.sha256(headers.get("authorization", "").encode()).hexdigest()
+        key = f"{owner}:{idempotency_key}"
+
+        try:
+            cached = await self.store.acquire(key, request_fingerprint(scope, body))
+        except IdempotencyConflict:
+            response = JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"}, status_code=422
+            )
+            await response(scope, receive, send)
+            return
+        except IdempotencyInProgress:
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"}, status_code=409
+            )
+            await response(scope, receive, send)
+            return
+
+        if cached is not None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": cached.status_code,
+                    "headers": cached.headers + [(b"idempotent-replayed", b"true")],
+                }
+            )
+            await send({"type": "http.response.body", "body": cached.body})
+            return
+
+        status_code = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def replay_receive() -> Message:
+            nonlocal body
+            if body is None:
+                return await receive()
+            message = {"type": "http.request", "body": body, "more_body": False}
+            body = None
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except BaseException:
+            await self.store.release(key)
+            raise
+
+        if status_code >= 500 or status_code in RETRYABLE_STATUS_CODES:
+            await self.store.release(key)
+        else:
+            await self.store.complete(key, CachedResponse(status_code, response_headers, b"".join(chunks)))
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def create_store(backend: str, max_entries: int, ttl: float, lock_timeout: float, wait_timeout: float):
+    if backend == "memory":
+        return MemoryIdempotencyStore(
+            max_entries=max_entries, ttl=ttl, lock_timeout=lock_timeout, wait_timeout=wait_timeout
+        )
+    if backend == "database":
+        return DatabaseIdempotencyStore(ttl=ttl, lock_timeout=lock_timeout, wait_timeout=wait_timeout)
+    raise ValueError(f"Unknown idempotency backend: {backend}")
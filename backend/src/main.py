@@ -1,26 +1,110 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import engine, Base
+from .config import settings
+from .compression import CompressionMiddleware
+from .idempotency import IdempotencyMiddleware, create_store
+from .ratelimit import LoadSheddingMiddleware
+from . import database
+from .database import Base
+from .ordering import rebalancer
+from .scheduler import scheduler
+from .activity import activity_logger
 from .routers import auth_router, projects_router, todos_router, tags_router
 
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker builds its own engine and pool here rather than at import,
+    # so a preloaded app can be forked safely. Phase timings end up in app.state.
+    timings = {}
+    app.state.startup_timings = timings
+
+    start = time.perf_counter()
+    engine = database.init_engine()
+    timings["engine"] = time.perf_counter() - start
+
+    # Create database tables (`run.py serve` does this once before forking workers)
+    if settings.DB_CREATE_ALL:
+        start = time.perf_counter()
+        Base.metadata.create_all(bind=engine)
+        timings["create_all"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    database.warm_up(settings.DB_POOL_WARMUP)
+    timings["pool_warm_up"] = time.perf_counter() - start
+
+    # Background tasks run for the lifetime of the app
+    start = time.perf_counter()
+    await rebalancer.start()
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.start()
+    if settings.ACTIVITY_LOG_ENABLED:
+        await activity_logger.start()
+    timings["background_tasks"] = time.perf_counter() - start
+
+    logger.info("Startup took %s", ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.items()))
+    yield
+
+    await scheduler.stop()
+    await rebalancer.stop()
+    await activity_logger.stop()
+    database.dispose_engine()
+
+
 # Create the FastAPI app
-app = FastAPI(title="Todo App API")
+app = FastAPI(title="Todo App API", lifespan=lifespan)
+
+# Replay responses for retried mutations carrying an Idempotency-Key. Limited to the resource
+# routes: /auth responses hold tokens that must not be stored or outlive their expiry.
+# Added first so it sits inside CORS and compression and stores uncompressed bodies.
+app.add_middleware(
+    IdempotencyMiddleware,
+    path_prefixes=("/todos", "/projects", "/tags"),
+    store=create_store(
+        settings.IDEMPOTENCY_BACKEND,
+        max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+        ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+        lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS,
+        wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT_SECONDS,
+    ),
+)
 
-# CORS middleware configuration
+# Negotiated gzip/brotli compression for large responses
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Shed load before requests queue up; outside everything but CORS so rejected requests cost little
+app.add_middleware(
+    LoadSheddingMiddleware,
+    max_concurrency=settings.LOAD_SHED_MAX_CONCURRENCY,
+    path_limits={"/auth": settings.LOAD_SHED_AUTH_MAX_CONCURRENCY},
+    retry_after=settings.LOAD_SHED_RETRY_AFTER_SECONDS,
+)
+
+# CORS middleware configuration. Added last so it is outermost and every response, including
+# the shedder's 503s, carries the CORS headers the browser needs to read it.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000"],  # Frontend URL
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "X-Requested-With"],
-    expose_headers=["Content-Type", "Content-Length"],
+    allow_headers=["Content-Type", "Authorization", "Accept", "X-Requested-With", "Idempotency-Key"],
+    expose_headers=["Content-Type", "Content-Length", "Idempotent-Replayed", "Retry-After"],
     max_age=600,  # 10 minutes
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 # Include routers
 app.include_router(auth_router)
 app.include_router(projects_router)
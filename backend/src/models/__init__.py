@@ -2,3 +2,7 @@ from .user import User
 from .project import Project
 from .todo import Todo, TodoStatus, TodoPriority
 from .tag import Tag, todo_tag
+from .idempotency import IdempotencyKey
+from .rate_limit import RateLimitBucket
+from .scheduler_lease import SchedulerLease
+from .activity import ActivityLog
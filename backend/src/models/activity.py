@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
+
+from ..database import Base
+
+
+class ActivityLog(Base):
+    __tablename__ = "activity_log"
+    __table_args__ = (Index("ix_activity_log_entity", "entity_type", "entity_id", "id"),)
+
+    # Append-only, so an integer id doubles as the pagination cursor
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String, nullable=False)  # "todo", "project" or "tag"
+    entity_id = Column(String, nullable=False)
+    user_id = Column(String, index=True)
+    action = Column(String, nullable=False)  # "create", "update" or "delete"
+    changes = Column(Text, nullable=False)  # JSON: {field: {"old": ..., "new": ...}}
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, LargeBinary, Text
+
+from ..database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    headers = Column(Text, nullable=True)  # JSON encoded list of [name, value] pairs
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
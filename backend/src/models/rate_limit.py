@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Float
+
+from ..database import Base
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix timestamp of the last refill
+    full_at = Column(Float, nullable=False, index=True)  # When the bucket is full again and can be deleted
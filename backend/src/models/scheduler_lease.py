@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+
+from ..database import Base
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
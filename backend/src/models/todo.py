@@ -1,7 +1,7 @@
 from datetime import datetime
 import uuid
 import enum
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Enum
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Enum, Index
 from sqlalchemy.orm import relationship
 
 from ..database import Base
@@ -24,6 +24,11 @@ class TodoPriority(int, enum.Enum):
 
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        Index("ix_todos_project_id_position", "project_id", "position"),
+        Index("ix_todos_is_completed_due_date", "is_completed", "due_date"),
+        Index("ix_todos_updated_at", "updated_at"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
     project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), index=True)
@@ -35,6 +40,9 @@ class Todo(Base):
     is_completed = Column(Boolean, default=False)
     due_date = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    # Fractional-index key for manual ordering within a project (see ordering.py).
+    # Keys compare byte-wise, so Postgres needs the "C" collation.
+    position = Column(String().with_variant(String(collation="C"), "postgresql"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -0,0 +1,279 @@
+"""Fractional-index ordering for todos.
+
+Positions are base-62 strings that sort lexicographically. A key can always be generated
+between any two others, so moving a todo rewrites only that todo's row. The format follows
+the `fractional-indexing` scheme: a variable-length integer part (its first character encodes
+its length) followed by an optional fractional part, which keeps appends short.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import database
+from .config import settings
+from .models import Todo
+
+logger = logging.getLogger(__name__)
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    # a < b, both fractional parts without trailing zeros; b=None means "1"
+    if b is not None:
+        n = 0
+        while (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Invalid order key: {key}")
+    return key[:length]
+
+
+def _validate_key(key: str):
+    if key == _SMALLEST_INTEGER:
+        raise ValueError(f"Invalid order key: {key}")
+    integer = _integer_part(key)
+    if key[len(integer) :].endswith(DIGITS[0]):
+        raise ValueError(f"Invalid order key: {key}")
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Return a key that sorts strictly between `a` and `b` (None means unbounded)."""
+    if a is not None:
+        _validate_key(a)
+    if b is not None:
+        _validate_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a} is not less than {b}")
+
+    if a is None:
+        if b is None:
+            return "a" + DIGITS[0]
+        integer_b = _integer_part(b)
+        if integer_b == _SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b) :])
+        if integer_b < b:
+            return integer_b
+        key = _decrement_integer(integer_b)
+        if key is None:
+            raise ValueError("Cannot decrement any more")
+        return key
+
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a) :]
+    if b is None:
+        key = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if key is None else key
+
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b) :])
+    key = _increment_integer(integer_a)
+    if key is None:
+        raise ValueError("Cannot increment any more")
+    if key < b:
+        return key
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(a: Optional[str], b: Optional[str], n: int) -> List[str]:
+    """Return `n` evenly spread, increasing keys between `a` and `b`."""
+    if n == 0:
+        return []
+    if n == 1:
+        return [key_between(a, b)]
+    if b is None:
+        keys = [key_between(a, None)]
+        for _ in range(n - 1):
+            keys.append(key_between(keys[-1], None))
+        return keys
+    if a is None:
+        keys = [key_between(None, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(None, keys[-1]))
+        return keys[::-1]
+    middle = n // 2
+    key = key_between(a, b)
+    return [*keys_between(a, key, middle), key, *keys_between(key, b, n - middle - 1)]
+
+
+def last_position(db: Session, project_id: str) -> Optional[str]:
+    return db.query(func.max(Todo.position)).filter(Todo.project_id == project_id).scalar()
+
+
+def append_position(db: Session, project_id: str) -> str:
+    """Key for a todo added at the end of a project."""
+    return key_between(last_position(db, project_id), None)
+
+
+def _neighbour(db: Session, todo: Todo, position: str, before: bool) -> Optional[str]:
+    query = db.query(Todo.position).filter(Todo.project_id == todo.project_id, Todo.id != todo.id)
+    if before:
+        query = query.filter(Todo.position < position).order_by(Todo.position.desc())
+    else:
+        query = query.filter(Todo.position > position).order_by(Todo.position)
+    return query.limit(1).scalar()
+
+
+def position_for_move(db: Session, todo: Todo, after: Optional[Todo], before: Optional[Todo]) -> str:
+    """Key placing `todo` right after `after` and/or right before `before`.
+
+    Only the neighbouring key is read, through the (project_id, position) index.
+    Raises ValueError when the neighbours' keys are missing or out of order.
+    """
+    if (after is not None and after.position is None) or (before is not None and before.position is None):
+        raise ValueError("Neighbour has no position")
+
+    if after is not None and before is None:
+        return key_between(after.position, _neighbour(db, todo, after.position, before=False))
+    if before is not None and after is None:
+        return key_between(_neighbour(db, todo, before.position, before=True), before.position)
+    return key_between(after.position, before.position)
+
+
+def rebalance_project(db: Session, project_id: str) -> int:
+    """Rewrite every position in a project with short, evenly spread keys.
+
+    Todos without a position are placed after the others in creation order.
+    Returns the number of rows rewritten.
+    """
+    rows = (
+        db.query(Todo.id, Todo.updated_at)
+        .filter(Todo.project_id == project_id)
+        .order_by(Todo.position.is_(None), Todo.position, Todo.created_at, Todo.id)
+        .all()
+    )
+    keys = keys_between(None, None, len(rows))
+    if rows:
+        # updated_at is written back as it was: a rebalance isn't a change to the todos, and
+        # bumping it would make the scheduler's rescan reload the whole project
+        db.execute(
+            update(Todo),
+            [{"id": row.id, "position": key, "updated_at": row.updated_at} for row, key in zip(rows, keys)],
+        )
+    db.commit()
+    return len(rows)
+
+
+class Rebalancer:
+    """Background task rebalancing projects whose keys have grown too long."""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, project_id: str):
+        if self._queue is None or project_id in self._pending:
+            return
+        self._pending.add(project_id)
+        self._queue.put_nowait(project_id)
+
+    def schedule_if_needed(self, project_id: str, position: str):
+        if len(position) > settings.ORDERING_MAX_KEY_LENGTH:
+            self.schedule(project_id)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._queue = None
+        self._task = None
+        self._pending.clear()
+
+    async def _run(self):
+        while True:
+            project_id = await self._queue.get()
+            self._pending.discard(project_id)
+            try:
+                count = await run_in_threadpool(self._rebalance, project_id)
+                logger.info("Rebalanced %d todo positions in project %s", count, project_id)
+            except Exception:
+                logger.exception("Failed to rebalance project %s", project_id)
+
+    def _rebalance(self, project_id: str) -> int:
+        db = database.SessionLocal()
+        try:
+            return rebalance_project(db, project_id)
+        finally:
+            db.close()
+
+
+rebalancer = Rebalancer()
@@ -0,0 +1,192 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from . import database
+from .config import settings
+from .models import RateLimitBucket
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, burst: int) -> float:
+    return min(float(burst), tokens + (now - updated_at) * rate)
+
+
+class MemoryRateLimiter:
+    """Token buckets kept in this process.
+
+    Buckets are only touched from the event loop and `hit` never awaits, so no lock is needed.
+    The least recently used buckets are dropped past `max_keys`; a dropped bucket starts full again.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        """Take a token from `key`'s bucket. Returns 0 if allowed, otherwise seconds until a token frees up."""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (float(burst), now))
+        tokens = _refill(tokens, updated_at, now, rate, burst)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class DatabaseRateLimiter:
+    """Token buckets in the `rate_limit_buckets` table, shared by every worker.
+
+    A missing row is a full bucket, so rows left alone long enough to refill are
+    purged every `purge_interval` seconds by whichever request comes along.
+    """
+
+    purge_interval = 60
+
+    def __init__(self):
+        self._next_purge = 0.0
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            await run_in_threadpool(self._purge)
+        return await run_in_threadpool(self._hit, key, rate, burst)
+
+    def _locked_bucket(self, db, key: str) -> Optional[RateLimitBucket]:
+        return db.query(RateLimitBucket).filter(RateLimitBucket.key == key).with_for_update().first()
+
+    def _hit(self, key: str, rate: float, burst: int) -> float:
+        db = database.SessionLocal()
+        try:
+            now = time.time()
+            bucket = self._locked_bucket(db, key)
+            while bucket is None:
+                # Concurrent first hits both insert; the loser takes its token from the winner's row
+                db.add(RateLimitBucket(key=key, tokens=float(burst), updated_at=now, full_at=now))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                bucket = self._locked_bucket(db, key)
+
+            tokens = _refill(bucket.tokens, bucket.updated_at, now, rate, burst)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+
+            bucket.tokens = tokens
+            bucket.updated_at = now
+            bucket.full_at = now + (burst - tokens) / rate
+            db.commit()
+            return wait
+        finally:
+            db.close()
+
+    def _purge(self):
+        db = database.SessionLocal()
+        try:
+            db.query(RateLimitBucket).filter(RateLimitBucket.full_at <= time.time()).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def create_limiter(backend: str, max_keys: int):
+    if backend == "memory":
+        return MemoryRateLimiter(max_keys=max_keys)
+    if backend == "database":
+        return DatabaseRateLimiter()
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+limiter = create_limiter(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_MAX_KEYS)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+async def check_auth_limits(request: Request, username: str):
+    """Rate limit an auth attempt by client IP and by the username or email it targets."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+
+    wait = max(
+        await limiter.hit(
+            f"auth:ip:{client_ip(request)}", settings.RATE_LIMIT_AUTH_IP_RATE, settings.RATE_LIMIT_AUTH_IP_BURST
+        ),
+        await limiter.hit(
+            f"auth:user:{username.lower()}", settings.RATE_LIMIT_AUTH_USER_RATE, settings.RATE_LIMIT_AUTH_USER_BURST
+        ),
+    )
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+class LoadSheddingMiddleware:
+    """Reject requests with 503 once too many are already in flight.
+
+    `path_limits` caps the concurrency of individual path prefixes (e.g. the bcrypt
+    heavy /auth routes) below the global limit. A limit of 0 disables that cap.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_concurrency: int = 0,
+        path_limits: Optional[Dict[str, int]] = None,
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.max_concurrency = max_concurrency
+        self.path_limits = {prefix: limit for prefix, limit in (path_limits or {}).items() if limit > 0}
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.path_in_flight = {prefix: 0 for prefix in self.path_limits}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        prefix = next((prefix for prefix in self.path_limits if scope["path"].startswith(prefix)), None)
+        if (self.max_concurrency and self.in_flight >= self.max_concurrency) or (
+            prefix is not None and self.path_in_flight[prefix] >= self.path_limits[prefix]
+        ):
+            response = JSONResponse(
+                {"detail": "Server is busy, try again later"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        # Counters are only changed on the event loop, between awaits
+        self.in_flight += 1
+        if prefix is not None:
+            self.path_in_flight[prefix] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            if prefix is not None:
+                self.path_in_flight[prefix] -= 1
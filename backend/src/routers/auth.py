@@ -1,9 +1,9 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from .. import schemas, auth, security
+from .. import schemas, auth, security, ratelimit
 from ..config import settings
 from ..database import get_db
 
@@ -11,7 +11,8 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=schemas.User)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(request: Request, user: schemas.UserCreate, db: Session = Depends(get_db)):
+    await ratelimit.check_auth_limits(request, user.email)
     db_user = db.query(auth.User).filter(auth.User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -19,7 +20,8 @@ async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=schemas.Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    await ratelimit.check_auth_limits(request, form_data.username)
     user = await auth.authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
@@ -5,6 +5,7 @@ import uuid
 from .. import schemas, auth
 from ..database import get_db
 from ..models import Project
+from ..scheduler import scheduler
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -80,3 +81,5 @@ async def delete_project(
 
     db.delete(db_project)
     db.commit()
+    # The project's todos were deleted with it
+    scheduler.forget(current_user.id)
@@ -1,17 +1,29 @@
 from datetime import datetime
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Any, Dict, Optional, List, Union
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 import uuid
 
-from .. import schemas, auth
+from .. import schemas, auth, ordering
 from ..database import get_db
-from ..models import Todo, Project, Tag, todo_tag, TodoStatus
+from ..serialization import parse_fields, apply_todo_fields, serialize_todos
+from ..scheduler import scheduler
+from ..models import Todo, Project, Tag, todo_tag, TodoStatus, ActivityLog
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
 
-@router.get("", response_model=list[schemas.TodoWithProject])
+@router.get(
+    "",
+    response_model=None,
+    responses={
+        200: {
+            "model": Union[List[schemas.TodoWithProject], List[Dict[str, Any]], schemas.TodoCollection],
+            "description": "Full todos by default, only the requested keys with `fields`, "
+            "or a `TodoCollection` with `sideload`",
+        }
+    },
+)
 async def get_todos(
     db: Session = Depends(get_db),
     current_user: auth.User = Depends(auth.get_current_user),
@@ -22,7 +34,10 @@ async def get_todos(
     due_date_after: Optional[datetime] = None,
     priority: Optional[int] = None,
     tag_id: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated todo fields, e.g. id,title,project"),
+    sideload: bool = Query(False, description="Return related projects and tags once under `included`"),
 ):
+    selected = parse_fields(fields)
     query = db.query(Todo).filter(Todo.user_id == current_user.id)
 
     # Apply filters
@@ -47,7 +62,15 @@ async def get_todos(
     if tag_id:
         query = query.join(todo_tag).filter(todo_tag.c.tag_id == tag_id)
 
-    return query.all()
+    # Within a project todos come back in their manual order, served by ix_todos_project_id_position
+    if project_id:
+        query = query.order_by(Todo.position, Todo.created_at)
+
+    query = apply_todo_fields(query, selected)
+
+    # Serialized directly: sparse and side-loaded shapes don't fit a single response model,
+    # and without `fields` the output matches TodoWithProject
+    return Response(content=serialize_todos(query.all(), selected, sideload), media_type="application/json")
 
 
 @router.post("", response_model=schemas.TodoWithProject, status_code=status.HTTP_201_CREATED)
@@ -63,7 +86,7 @@ async def create_todo(
 
     # Create the todo
     todo_data = todo.model_dump(exclude={"tag_ids"})
-    db_todo = Todo(**todo_data, user_id=current_user.id)
+    db_todo = Todo(**todo_data, user_id=current_user.id, position=ordering.append_position(db, todo.project_id))
     db.add(db_todo)
     db.commit()
     db.refresh(db_todo)
@@ -73,9 +96,26 @@ async def create_todo(
         add_tags_to_todo(db, db_todo.id, todo.tag_ids, current_user.id)
         db.refresh(db_todo)
 
+    scheduler.track(db_todo)
     return db_todo
 
 
+@router.get("/overdue-count", response_model=schemas.OverdueCount)
+async def get_overdue_count(
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(auth.get_current_user),
+):
+    # Only the scheduler's leader keeps counts in memory, other workers ask the database
+    if scheduler.is_leader:
+        return {"overdue": scheduler.overdue_count(current_user.id)}
+    overdue = (
+        db.query(Todo)
+        .filter(Todo.user_id == current_user.id, Todo.is_completed == False, Todo.due_date < datetime.utcnow())
+        .count()
+    )
+    return {"overdue": overdue}
+
+
 @router.get("/{todo_id}", response_model=schemas.TodoWithProject)
 async def get_todo(
     todo_id: str,
@@ -88,6 +128,33 @@ async def get_todo(
     return db_todo
 
 
+@router.get("/{todo_id}/history", response_model=list[schemas.ActivityEntry])
+async def get_todo_history(
+    todo_id: str,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(auth.get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[int] = Query(None, description="Return entries older than this entry id"),
+):
+    # Newest first; pass the last id of a page as `before` to get the next one.
+    # Entries are written in the background, so the latest change may take a moment to appear.
+    query = db.query(ActivityLog).filter(
+        ActivityLog.entity_type == "todo",
+        ActivityLog.entity_id == todo_id,
+        ActivityLog.user_id == current_user.id,
+    )
+    if before is not None:
+        query = query.filter(ActivityLog.id < before)
+    entries = query.order_by(ActivityLog.id.desc()).limit(limit).all()
+
+    # History outlives the todo, so only a todo with neither is unknown
+    if not entries and before is None:
+        db_todo = db.query(Todo).filter(Todo.id == todo_id, Todo.user_id == current_user.id).first()
+        if not db_todo:
+            raise HTTPException(status_code=404, detail="Todo not found")
+    return entries
+
+
 @router.put("/{todo_id}", response_model=schemas.TodoWithProject)
 async def update_todo(
     todo_id: str,
@@ -113,6 +180,10 @@ async def update_todo(
         if "status" not in update_data:
             update_data["status"] = TodoStatus.TODO
 
+    # Todos moved to another project go to the end of it
+    if update_data.get("project_id") and update_data["project_id"] != db_todo.project_id:
+        update_data["position"] = ordering.append_position(db, update_data["project_id"])
+
     for key, value in update_data.items():
         setattr(db_todo, key, value)
 
@@ -125,6 +196,45 @@ async def update_todo(
 
     db.commit()
     db.refresh(db_todo)
+    scheduler.track(db_todo)
+    return db_todo
+
+
+@router.patch("/{todo_id}/move", response_model=schemas.TodoWithProject)
+async def move_todo(
+    todo_id: str,
+    move: schemas.TodoMove,
+    db: Session = Depends(get_db),
+    current_user: auth.User = Depends(auth.get_current_user),
+):
+    db_todo = db.query(Todo).filter(Todo.id == todo_id, Todo.user_id == current_user.id).first()
+    if not db_todo:
+        raise HTTPException(status_code=404, detail="Todo not found")
+
+    if move.after_id is None and move.before_id is None:
+        raise HTTPException(status_code=400, detail="Either after_id or before_id is required")
+
+    after = get_sibling(db, db_todo, move.after_id, current_user.id)
+    before = get_sibling(db, db_todo, move.before_id, current_user.id)
+    if after and before and after.position and before.position and after.position > before.position:
+        raise HTTPException(status_code=400, detail="after_id must come before before_id")
+
+    try:
+        position = ordering.position_for_move(db, db_todo, after, before)
+    except ValueError:
+        # Missing or duplicate keys (e.g. concurrent appends), respread the project and retry once
+        ordering.rebalance_project(db, db_todo.project_id)
+        try:
+            position = ordering.position_for_move(db, db_todo, after, before)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="after_id must come before before_id")
+
+    # Only the moved row is written
+    db_todo.position = position
+    db.commit()
+    db.refresh(db_todo)
+
+    ordering.rebalancer.schedule_if_needed(db_todo.project_id, position)
     return db_todo
 
 
@@ -140,6 +250,23 @@ async def delete_todo(
 
     db.delete(db_todo)
     db.commit()
+    scheduler.forget(current_user.id)
+
+
+# Helper function to look up the todo a move is relative to
+def get_sibling(db: Session, todo: Todo, sibling_id: Optional[str], user_id: str) -> Optional[Todo]:
+    """Load a todo next to which `todo` is being moved, validating it's in the same project."""
+    if sibling_id is None:
+        return None
+    if sibling_id == todo.id:
+        raise HTTPException(status_code=400, detail="Cannot move a todo relative to itself")
+
+    sibling = db.query(Todo).filter(Todo.id == sibling_id, Todo.user_id == user_id).first()
+    if not sibling:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    if sibling.project_id != todo.project_id:
+        raise HTTPException(status_code=400, detail="Todos must be in the same project")
+    return sibling
 
 
 # Helper function to add tags to todo
@@ -0,0 +1,331 @@
+"""Background scheduler acting on todo due dates.
+
+One worker at a time holds the `due_dates` lease and scans; the others stand by and take
+over when the lease expires. The leader keeps a min-heap of upcoming due dates, loaded a
+batch at a time from the (is_completed, due_date) index, and keeps per-user overdue counts.
+Changes made through other workers are picked up by rescanning recently updated todos.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_, and_, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from . import database
+from .config import settings
+from .models import SchedulerLease, Todo
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "due_dates"
+
+# Rows are stamped with updated_at before their transaction commits, possibly on another
+# host's clock, so each rescan reaches back this far past the previous one
+RESCAN_OVERLAP = timedelta(seconds=5)
+
+
+@dataclass
+class DueEvent:
+    kind: str  # "due" when the due date is near, "overdue" once it has passed
+    todo_id: str
+    user_id: str
+    due_date: datetime
+
+
+class DueDateScheduler:
+    def __init__(self):
+        self.owner: Optional[str] = None
+        self.is_leader = False
+        self._handlers: List[Callable[[DueEvent], None]] = []
+        self._heap: List[Tuple[datetime, int, str, str, str, datetime]] = []
+        self._scheduled: Dict[str, datetime] = {}  # todo id -> due date it's in the heap for
+        self._sequence = itertools.count()
+        self._loaded_until: Optional[Tuple[datetime, str]] = None
+        self._scanned_at: Optional[datetime] = None
+        self._overdue: Dict[str, int] = {}
+        self._recount_users: Set[str] = set()
+        self._last_reconcile: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, handler: Callable[[DueEvent], None]):
+        self._handlers.append(handler)
+
+    def overdue_count(self, user_id: str) -> int:
+        return self._overdue.get(user_id, 0)
+
+    def track(self, todo: Todo):
+        """Tell the scheduler a todo was created or changed.
+
+        Only takes effect on the leader; changes made on other workers are found by the next
+        rescan. Todos beyond the loaded window are picked up by the next incremental load;
+        stale heap entries are dropped when they fire.
+        """
+        if not self.is_leader:
+            return
+        self._recount_users.add(todo.user_id)
+        if todo.due_date is not None and not todo.is_completed:
+            self._push_if_loaded(todo.id, todo.user_id, todo.due_date)
+        self._wake()
+
+    def forget(self, user_id: str):
+        """Tell the scheduler one of the user's todos was deleted."""
+        if not self.is_leader:
+            return
+        self._recount_users.add(user_id)
+        self._wake()
+
+    async def start(self):
+        # Set here rather than in __init__ so each forked worker gets its own identity
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await run_in_threadpool(self._release_lease)
+        self._reset()
+        self._task = None
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _reset(self):
+        self.is_leader = False
+        self._heap.clear()
+        self._scheduled.clear()
+        self._loaded_until = None
+        self._scanned_at = None
+        self._overdue.clear()
+        self._recount_users.clear()
+        self._last_reconcile = None
+
+    def _push_if_loaded(self, todo_id: str, user_id: str, due_date: datetime):
+        if self._loaded_until is not None and (due_date, todo_id) <= self._loaded_until:
+            self._push(todo_id, user_id, due_date)
+
+    def _push(self, todo_id: str, user_id: str, due_date: datetime):
+        # A due date that has passed has fired already (or never will); the recount covers it
+        if self._scheduled.get(todo_id) == due_date or due_date <= datetime.utcnow():
+            return
+        self._scheduled[todo_id] = due_date
+        due_soon = due_date - timedelta(seconds=settings.SCHEDULER_DUE_SOON_SECONDS)
+        heapq.heappush(self._heap, (due_soon, next(self._sequence), "due", todo_id, user_id, due_date))
+        heapq.heappush(self._heap, (due_date, next(self._sequence), "overdue", todo_id, user_id, due_date))
+
+    async def _run(self):
+        renew_every = settings.SCHEDULER_LEASE_SECONDS / 3
+        while True:
+            try:
+                leader = await run_in_threadpool(self._acquire_lease)
+                if leader and not self.is_leader:
+                    logger.info("Due date scheduler %s is now the leader", self.owner)
+                elif not leader and self.is_leader:
+                    logger.info("Due date scheduler %s lost the lease", self.owner)
+                    self._reset()
+                self.is_leader = leader
+
+                timeout = renew_every
+                if leader:
+                    timeout = min(timeout, await self._tick())
+            except Exception:
+                logger.exception("Due date scheduler failed")
+                timeout = renew_every
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0.01))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _tick(self) -> float:
+        """Run one scheduling pass and return how long to sleep before the next."""
+        now = datetime.utcnow()
+        horizon = now + timedelta(seconds=settings.SCHEDULER_LOOKAHEAD_SECONDS)
+
+        if self._loaded_until is None:
+            self._loaded_until = (now, "")
+            self._scanned_at = now
+        elif now > self._scanned_at:
+            # Todos created or re-dated through other workers inside the loaded window
+            since = self._scanned_at - RESCAN_OVERLAP
+            rows, users = await run_in_threadpool(self._changed, since, now, self._loaded_until[0])
+            self._scanned_at = now
+            self._recount_users.update(users)
+            for todo_id, user_id, due_date in rows:
+                self._push_if_loaded(todo_id, user_id, due_date)
+        if self._loaded_until[0] < horizon:
+            rows, self._loaded_until = await run_in_threadpool(self._load, self._loaded_until, horizon)
+            for todo_id, user_id, due_date in rows:
+                self._push(todo_id, user_id, due_date)
+
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            fired.append(heapq.heappop(self._heap))
+        if fired:
+            await self._fire(fired)
+
+        # Recounts run after firing so they overwrite any increments for the same todos
+        reconcile_every = timedelta(seconds=settings.SCHEDULER_RECONCILE_SECONDS)
+        if self._last_reconcile is None or now - self._last_reconcile >= reconcile_every:
+            self._recount_users.clear()
+            self._overdue = await run_in_threadpool(self._count_overdue, now, None)
+            self._last_reconcile = now
+        elif self._recount_users:
+            users, self._recount_users = self._recount_users, set()
+            counts = await run_in_threadpool(self._count_overdue, now, users)
+            for user_id in users:
+                if counts.get(user_id):
+                    self._overdue[user_id] = counts[user_id]
+                else:
+                    self._overdue.pop(user_id, None)
+
+        timeout = settings.SCHEDULER_POLL_SECONDS
+        if self._heap:
+            timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+        return timeout
+
+    async def _fire(self, entries):
+        # Entries may be stale (todo completed, rescheduled or deleted), so check them in one query
+        current = await run_in_threadpool(self._current_due_dates, {entry[3] for entry in entries})
+        for _, _, kind, todo_id, user_id, due_date in entries:
+            if kind == "overdue" and self._scheduled.get(todo_id) == due_date:
+                del self._scheduled[todo_id]
+            if current.get(todo_id) != due_date:
+                continue
+            if kind == "overdue":
+                self._overdue[user_id] = self._overdue.get(user_id, 0) + 1
+            self._emit(DueEvent(kind=kind, todo_id=todo_id, user_id=user_id, due_date=due_date))
+
+    def _emit(self, event: DueEvent):
+        logger.debug("Todo %s is %s (due %s)", event.todo_id, event.kind, event.due_date)
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Due date event handler failed")
+
+    def _load(self, after: Tuple[datetime, str], horizon: datetime):
+        """Load the next batch of incomplete todos due after `after` and up to `horizon`."""
+        after_due, after_id = after
+        db = database.SessionLocal()
+        try:
+            rows = (
+                db.query(Todo.id, Todo.user_id, Todo.due_date)
+                .filter(
+                    Todo.is_completed == False,
+                    Todo.due_date <= horizon,
+                    or_(Todo.due_date > after_due, and_(Todo.due_date == after_due, Todo.id > after_id)),
+                )
+                .order_by(Todo.due_date, Todo.id)
+                .limit(settings.SCHEDULER_BATCH_SIZE)
+                .all()
+            )
+        finally:
+            db.close()
+
+        if len(rows) < settings.SCHEDULER_BATCH_SIZE:
+            return rows, (horizon, "")
+        return rows, (rows[-1].due_date, rows[-1].id)
+
+    def _changed(self, since: datetime, now: datetime, until: datetime):
+        """Incomplete todos updated after `since` and due between `now` and `until`, and every
+        user with a todo updated after `since` (whose overdue count may have changed)."""
+        db = database.SessionLocal()
+        try:
+            rows = (
+                db.query(Todo.id, Todo.user_id, Todo.due_date)
+                .filter(
+                    Todo.updated_at > since,
+                    Todo.is_completed == False,
+                    Todo.due_date > now,
+                    Todo.due_date <= until,
+                )
+                .all()
+            )
+            users = {row.user_id for row in db.query(Todo.user_id).filter(Todo.updated_at > since).distinct()}
+            return rows, users
+        finally:
+            db.close()
+
+    def _current_due_dates(self, todo_ids: Set[str]) -> Dict[str, datetime]:
+        db = database.SessionLocal()
+        try:
+            rows = (
+                db.query(Todo.id, Todo.due_date)
+                .filter(Todo.id.in_(todo_ids), Todo.is_completed == False)
+                .all()
+            )
+            return {row.id: row.due_date for row in rows}
+        finally:
+            db.close()
+
+    def _count_overdue(self, now: datetime, user_ids: Optional[Set[str]]) -> Dict[str, int]:
+        db = database.SessionLocal()
+        try:
+            query = db.query(Todo.user_id, func.count(Todo.id)).filter(
+                Todo.is_completed == False, Todo.due_date < now
+            )
+            if user_ids is not None:
+                query = query.filter(Todo.user_id.in_(user_ids))
+            return dict(query.group_by(Todo.user_id).all())
+        finally:
+            db.close()
+
+    def _acquire_lease(self) -> bool:
+        """Take or renew the scheduler lease. Returns whether this worker holds it."""
+        db = database.SessionLocal()
+        try:
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS)
+            result = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == LEASE_NAME,
+                    or_(SchedulerLease.owner == self.owner, SchedulerLease.expires_at < now),
+                )
+                .values(owner=self.owner, expires_at=expires_at)
+            )
+            if result.rowcount == 1:
+                db.commit()
+                return True
+
+            db.add(SchedulerLease(name=LEASE_NAME, owner=self.owner, expires_at=expires_at))
+            try:
+                db.commit()
+                return True
+            except IntegrityError:
+                db.rollback()
+                return False
+        finally:
+            db.close()
+
+    def _release_lease(self):
+        db = database.SessionLocal()
+        try:
+            db.query(SchedulerLease).filter(
+                SchedulerLease.name == LEASE_NAME, SchedulerLease.owner == self.owner
+            ).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+scheduler = DueDateScheduler()
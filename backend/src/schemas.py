@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional, List, Union
+from typing import Any, Dict, Optional, List, Union
 from uuid import UUID
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, Json
 from enum import Enum
 
 from .models.todo import TodoStatus, TodoPriority
@@ -116,11 +116,17 @@ class TodoUpdate(TodoBase):
     tag_ids: Optional[List[str]] = None
 
 
+class TodoMove(BaseModel):
+    after_id: Optional[str] = None
+    before_id: Optional[str] = None
+
+
 class Todo(TodoBase):
     id: str
     project_id: str
     user_id: str
     completed_at: Optional[datetime] = None
+    position: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -137,6 +143,35 @@ class TodoWithProject(Todo):
         from_attributes = True
 
 
+class ActivityEntry(BaseModel):
+    id: int
+    entity_type: str
+    entity_id: str
+    user_id: str
+    action: str
+    changes: Json[Dict[str, Any]]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class OverdueCount(BaseModel):
+    overdue: int
+
+
+# Side-loaded list response: related projects and tags are returned once
+class TodoIncluded(BaseModel):
+    projects: Dict[str, Project] = {}
+    tags: Dict[str, Tag] = {}
+
+
+class TodoCollection(BaseModel):
+    # Todos carry project_id and tag_ids instead of the embedded objects
+    data: List[Dict[str, Any]] = []
+    included: TodoIncluded = TodoIncluded()
+
+
 class ProjectWithTodos(Project):
     todos: List[Todo] = []
 
@@ -0,0 +1,92 @@
+from typing import Any, Iterable, Optional, Set
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Query, load_only, selectinload
+
+from . import schemas
+from .models import Todo
+
+# Relationships that may be requested through `fields=` alongside plain columns
+TODO_RELATIONS = {"project", "tags"}
+TODO_COLUMNS = set(schemas.Todo.model_fields)
+
+_json_adapter = TypeAdapter(Any)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Parse a comma separated `fields=` value into a set of todo fields."""
+    if fields is None:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - TODO_COLUMNS - TODO_RELATIONS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+
+    # The id is always returned so clients can address the rows they get back
+    requested.add("id")
+    return requested
+
+
+def apply_todo_fields(query: Query, fields: Optional[Set[str]]) -> Query:
+    """Restrict the selected columns and eager load the requested relationships."""
+    if fields is None:
+        fields = TODO_COLUMNS | TODO_RELATIONS
+
+    columns = fields & TODO_COLUMNS
+    # project_id is needed to resolve the project, both inline and side-loaded
+    if "project" in fields:
+        columns = columns | {"project_id"}
+
+    query = query.options(load_only(*(getattr(Todo, name) for name in sorted(columns)), raiseload=True))
+
+    if "project" in fields:
+        query = query.options(selectinload(Todo.project))
+    if "tags" in fields:
+        query = query.options(selectinload(Todo.tags))
+    return query
+
+
+def serialize_todos(todos: Iterable[Todo], fields: Optional[Set[str]], sideload: bool = False) -> bytes:
+    """Serialize todos to JSON, either inline or with relations side-loaded once."""
+    if fields is None:
+        fields = TODO_COLUMNS | TODO_RELATIONS
+
+    columns = sorted(fields & TODO_COLUMNS)
+    with_project = "project" in fields
+    with_tags = "tags" in fields
+
+    data = []
+    projects = {}
+    tags = {}
+    for todo in todos:
+        item = {name: getattr(todo, name) for name in columns}
+
+        if with_project:
+            # Each project is validated once, however many todos point at it
+            if todo.project_id not in projects:
+                projects[todo.project_id] = schemas.Project.model_validate(todo.project).model_dump()
+            if sideload:
+                item["project_id"] = todo.project_id
+            else:
+                item["project"] = projects[todo.project_id]
+
+        if with_tags:
+            for tag in todo.tags:
+                if tag.id not in tags:
+                    tags[tag.id] = schemas.Tag.model_validate(tag).model_dump()
+            if sideload:
+                item["tag_ids"] = [tag.id for tag in todo.tags]
+            else:
+                item["tags"] = [tags[tag.id] for tag in todo.tags]
+
+        data.append(item)
+
+    if not sideload:
+        return _json_adapter.dump_json(data)
+
+    return _json_adapter.dump_json({"data": data, "included": {"projects": projects, "tags": tags}})
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# Settings are read when src is imported, so point the app at a scratch database first
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+
+import pytest  # noqa: E402
+
+from src import database, models  # noqa: E402, F401 (registers the tables)
+
+
+@pytest.fixture
+def db_engine():
+    engine = database.init_engine()
+    database.Base.metadata.create_all(bind=engine)
+    yield engine
+    database.Base.metadata.drop_all(bind=engine)
+    database.dispose_engine()
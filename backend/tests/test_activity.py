@@ -0,0 +1,224 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import event
+
+from src import database
+from src.activity import ActivityLogger, activity_logger
+from src.config import settings
+from src.models import ActivityLog, Project, Todo, TodoStatus, User
+
+
+def entries(n, prefix="todo"):
+    return [{"entity_id": f"{prefix}-{i}"} for i in range(n)]
+
+
+def test_failed_write_is_requeued_in_order(monkeypatch):
+    monkeypatch.setattr(settings, "ACTIVITY_BATCH_SIZE", 3)
+    activity = ActivityLogger()
+    activity._queue.extend(entries(5))
+    written = []
+
+    def failing_write(batch):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(activity, "_write", failing_write)
+    with pytest.raises(RuntimeError):
+        activity.flush()
+    assert list(activity._queue) == entries(5)
+
+    monkeypatch.setattr(activity, "_write", written.extend)
+    activity.flush()
+    assert written == entries(5)
+    assert activity.dropped == 0
+
+
+def test_requeue_drops_what_no_longer_fits(monkeypatch):
+    monkeypatch.setattr(settings, "ACTIVITY_QUEUE_SIZE", 4)
+    activity = ActivityLogger()
+    activity._queue.extend(entries(2, "newer"))
+
+    activity._requeue(entries(3, "failed"))
+
+    assert list(activity._queue) == entries(2, "failed") + entries(2, "newer")
+    assert activity.dropped == 1
+
+
+@pytest.fixture
+def activity(db_engine):
+    # Started on a loop that isn't running, so nothing is written until the test flushes
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(activity_logger.start())
+    yield activity_logger
+    loop.run_until_complete(activity_logger.stop())
+    loop.close()
+
+
+@pytest.fixture
+def session(db_engine):
+    db = database.SessionLocal()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def project(session):
+    user = User(username="u", email="u@example.com", password="x")
+    session.add(user)
+    session.flush()
+    project = Project(name="p", user_id=user.id)
+    session.add(project)
+    session.commit()
+    return project
+
+
+def queued(activity, entity_type="todo"):
+    return [
+        (entry["action"], json.loads(entry["changes"]))
+        for entry in activity._queue
+        if entry["entity_type"] == entity_type
+    ]
+
+
+def test_create_update_and_delete_are_captured(activity, session, project):
+    todo = Todo(title="a", project_id=project.id, user_id=project.user_id, priority=2)
+    session.add(todo)
+    session.commit()
+    todo.title = "b"
+    todo.priority = 2  # unchanged, not logged
+    todo.status = TodoStatus.DONE
+    session.commit()
+    session.delete(todo)
+    session.commit()
+
+    (create, created), (update, updated), (delete, deleted) = queued(activity)
+    assert (create, update, delete) == ("create", "update", "delete")
+    assert created["title"] == {"old": None, "new": "a"}
+    assert created["project_id"] == {"old": None, "new": project.id}
+    assert "created_at" not in created and "updated_at" not in created
+    assert updated == {"title": {"old": "a", "new": "b"}, "status": {"old": "todo", "new": "done"}}
+    assert deleted["title"] == {"old": "b", "new": None}
+    assert all(entry["entity_id"] == todo.id for entry in activity._queue if entry["entity_type"] == "todo")
+
+
+def test_project_delete_logs_cascaded_todos(activity, session, project):
+    todos = [Todo(title=f"t{i}", project_id=project.id, user_id=project.user_id) for i in range(3)]
+    session.add_all(todos)
+    session.commit()
+    activity._queue.clear()
+
+    session.delete(project)
+    session.commit()
+
+    assert [action for action, _ in queued(activity, "project")] == ["delete"]
+    deleted = {changes["title"]["old"] for action, changes in queued(activity) if action == "delete"}
+    assert deleted == {"t0", "t1", "t2"}
+
+
+def test_rolled_back_changes_are_discarded(activity, session, project):
+    session.add(Todo(title="never", project_id=project.id, user_id=project.user_id))
+    session.flush()
+    session.rollback()
+    session.add(Todo(title="kept", project_id=project.id, user_id=project.user_id))
+    session.commit()
+
+    assert [changes["title"]["new"] for _, changes in queued(activity)] == ["kept"]
+    assert "activity" not in session.info
+
+
+def test_nothing_is_captured_while_stopped(session, project):
+    session.add(Todo(title="a", project_id=project.id, user_id=project.user_id))
+    session.commit()
+
+    assert not activity_logger._queue
+    assert "activity" not in session.info
+
+
+def test_write_inserts_batches_in_one_statement(activity, session, project, monkeypatch):
+    monkeypatch.setattr(settings, "ACTIVITY_BATCH_SIZE", 4)
+    session.add_all(Todo(title=f"t{i}", project_id=project.id, user_id=project.user_id) for i in range(10))
+    session.commit()
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO activity_log"):
+            inserts.append(executemany)
+
+    event.listen(database.engine, "before_cursor_execute", count_inserts)
+    activity.flush()
+    event.remove(database.engine, "before_cursor_execute", count_inserts)
+
+    # 11 entries (the project and 10 todos) in batches of 4, each a single multi-row INSERT
+    assert inserts == [False, False, False]
+    rows = session.query(ActivityLog).filter(ActivityLog.entity_type == "todo").order_by(ActivityLog.id).all()
+    assert [row.action for row in rows] == ["create"] * 10
+    assert json.loads(rows[0].changes)["title"]["new"] == "t0"
+    assert not activity._queue
+
+
+@pytest.fixture
+def client(db_engine, monkeypatch):
+    from starlette.testclient import TestClient
+
+    from src.main import app
+
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    with TestClient(app) as client:
+        yield client
+
+
+def login(client, username):
+    credentials = {"username": username, "password": "secret123"}
+    client.post("/auth/register", json={**credentials, "email": f"{username}@example.com"})
+    token = client.post("/auth/login", data=credentials).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def history(client, todo_id, headers, **params):
+    # Entries are written in the background; flush so the test doesn't wait on the interval
+    activity_logger.flush()
+    return client.get(f"/todos/{todo_id}/history", headers=headers, params=params)
+
+
+def test_history_pages_newest_first(client):
+    headers = login(client, "ann")
+    project = client.post("/projects", json={"name": "p"}, headers=headers).json()
+    todo = client.post("/todos", json={"title": "v0", "project_id": project["id"]}, headers=headers).json()
+    for version in range(1, 5):
+        client.put(f"/todos/{todo['id']}", json={"title": f"v{version}"}, headers=headers)
+
+    pages = []
+    before = None
+    while True:
+        params = {"limit": 2} if before is None else {"limit": 2, "before": before}
+        page = history(client, todo["id"], headers, **params).json()
+        if not page:
+            break
+        pages.append([entry["changes"]["title"]["new"] for entry in page])
+        before = page[-1]["id"]
+
+    assert pages == [["v4", "v3"], ["v2", "v1"], ["v0"]]
+
+
+def test_history_outlives_the_todo(client):
+    headers = login(client, "bob")
+    project = client.post("/projects", json={"name": "p"}, headers=headers).json()
+    todo = client.post("/todos", json={"title": "a", "project_id": project["id"]}, headers=headers).json()
+    client.delete(f"/todos/{todo['id']}", headers=headers)
+
+    assert client.get(f"/todos/{todo['id']}", headers=headers).status_code == 404
+    response = history(client, todo["id"], headers)
+    assert response.status_code == 200
+    assert [entry["action"] for entry in response.json()] == ["delete", "create"]
+
+
+def test_history_of_unknown_or_foreign_todo_is_404(client):
+    owner = login(client, "cat")
+    project = client.post("/projects", json={"name": "p"}, headers=owner).json()
+    todo = client.post("/todos", json={"title": "a", "project_id": project["id"]}, headers=owner).json()
+    other = login(client, "dan")
+
+    assert history(client, "missing", owner).status_code == 404
+    assert history(client, todo["id"], other).status_code == 404
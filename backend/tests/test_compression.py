@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.testclient import TestClient
+
+from src import compression
+from src.compression import CompressionMiddleware, choose_encoding
+
+BODY = "todo " * 1000
+
+
+class FakeBrotli:
+    @staticmethod
+    def compress(body, quality):
+        return b"br:" + body[:10]
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", FakeBrotli)
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip;q=0.8", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("identity", None),
+        ("*", "br"),
+        ("*;q=0.1, gzip;q=0.5", "gzip"),
+        ("*, br;q=0", "gzip"),
+        ("gzip;q=bogus", None),
+        ("GZIP", "gzip"),
+    ],
+)
+def test_choose_encoding(with_brotli, header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_without_brotli(without_brotli):
+    assert choose_encoding("br") is None
+    assert choose_encoding("br, gzip;q=0.1") == "gzip"
+    assert choose_encoding("*") == "gzip"
+
+
+def make_client(response, minimum_size=100):
+    async def app(scope, receive, send):
+        await response(scope, receive, send)
+
+    return TestClient(CompressionMiddleware(app, minimum_size=minimum_size))
+
+
+def test_compresses_large_bodies(without_brotli):
+    response = make_client(PlainTextResponse(BODY)).get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.text == BODY
+
+
+def test_uses_brotli_when_preferred(with_brotli):
+    client = make_client(PlainTextResponse(BODY))
+    response = client.get("/", headers={"Accept-Encoding": "br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.content == b"br:" + BODY.encode()[:10]
+
+
+def test_skips_small_bodies(without_brotli):
+    response = make_client(PlainTextResponse("short")).get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text == "short"
+
+
+def test_skips_streamed_bodies(without_brotli):
+    response = make_client(StreamingResponse(iter([BODY.encode(), BODY.encode()]))).get(
+        "/", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert "content-encoding" not in response.headers
+    assert response.text == BODY * 2
+
+
+def test_skips_already_encoded_bodies(without_brotli):
+    upstream = PlainTextResponse(BODY, headers={"Content-Encoding": "x-custom"})
+    middleware = CompressionMiddleware(upstream, minimum_size=100)
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+
+    assert (b"content-encoding", b"x-custom") in sent[0]["headers"]
+    assert sent[1]["body"] == BODY.encode()
+
+
+def test_passes_through_without_accept_encoding(without_brotli):
+    response = make_client(PlainTextResponse(BODY)).get("/", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text == BODY
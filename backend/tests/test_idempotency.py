@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.responses import JSONResponse
+from starlette.testclient import TestClient
+
+from src import database
+from src.idempotency import (
+    DatabaseIdempotencyStore,
+    IdempotencyConflict,
+    IdempotencyInProgress,
+    IdempotencyMiddleware,
+    MemoryIdempotencyStore,
+)
+from src.models import IdempotencyKey
+
+
+def make_store(backend, **options):
+    if backend == "memory":
+        return MemoryIdempotencyStore(**options)
+    return DatabaseIdempotencyStore(**options)
+
+
+@pytest.fixture(params=["memory", "database"])
+def backend(request, db_engine):
+    return request.param
+
+
+def make_client(store, status_code=201):
+    calls = []
+
+    async def app(scope, receive, send):
+        message = await receive()
+        calls.append(message["body"])
+        response = JSONResponse({"call": len(calls)}, status_code=status_code)
+        await response(scope, receive, send)
+
+    return TestClient(IdempotencyMiddleware(app, store)), calls
+
+
+def test_replays_stored_response(backend):
+    client, calls = make_client(make_store(backend))
+    headers = {"Idempotency-Key": "abc", "Authorization": "Bearer one"}
+
+    first = client.post("/todos", content=b'{"title": "a"}', headers=headers)
+    second = client.post("/todos", content=b'{"title": "a"}', headers=headers)
+
+    assert len(calls) == 1
+    assert (second.status_code, second.json()) == (first.status_code, first.json()) == (201, {"call": 1})
+    assert second.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+
+def test_reused_key_with_different_request_conflicts(backend):
+    client, calls = make_client(make_store(backend))
+    headers = {"Idempotency-Key": "abc"}
+
+    client.post("/todos", content=b'{"title": "a"}', headers=headers)
+    response = client.post("/todos", content=b'{"title": "b"}', headers=headers)
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_keys_are_scoped_to_credentials(backend):
+    client, calls = make_client(make_store(backend))
+
+    client.post("/todos", content=b"{}", headers={"Idempotency-Key": "abc", "Authorization": "Bearer one"})
+    client.post("/todos", content=b"{}", headers={"Idempotency-Key": "abc", "Authorization": "Bearer two"})
+
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("status_code", [500, 503, 409, 429])
+def test_errors_worth_retrying_are_not_stored(backend, status_code):
+    client, calls = make_client(make_store(backend), status_code=status_code)
+    headers = {"Idempotency-Key": "abc"}
+
+    client.post("/todos", content=b"{}", headers=headers)
+    response = client.post("/todos", content=b"{}", headers=headers)
+
+    assert len(calls) == 2
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_duplicate_of_unfinished_request_is_in_progress(backend):
+    store = make_store(backend, wait_timeout=0.2)
+
+    async def run():
+        assert await store.acquire("key", "fingerprint") is None
+        with pytest.raises(IdempotencyInProgress):
+            await store.acquire("key", "fingerprint")
+        with pytest.raises(IdempotencyConflict):
+            await store.acquire("key", "other")
+
+    asyncio.run(run())
+
+
+def test_abandoned_key_is_taken_over_after_lock_timeout(backend):
+    store = make_store(backend, lock_timeout=0, wait_timeout=0.2)
+
+    async def run():
+        assert await store.acquire("key", "fingerprint") is None
+        # The first owner never completes or releases, as if its worker had died
+        assert await store.acquire("key", "fingerprint") is None
+
+    asyncio.run(run())
+
+
+def test_database_store_purges_expired_rows(db_engine):
+    db = database.SessionLocal()
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    db.add_all(IdempotencyKey(key=f"old-{i}", fingerprint="f", expires_at=expired) for i in range(3))
+    db.commit()
+
+    asyncio.run(DatabaseIdempotencyStore().acquire("new", "fingerprint"))
+
+    assert [row.key for row in db.query(IdempotencyKey).all()] == ["new"]
+    db.close()
+
+
+def test_paths_outside_prefixes_are_not_stored():
+    store = MemoryIdempotencyStore()
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await JSONResponse({"access_token": "secret"})(scope, receive, send)
+
+    client = TestClient(IdempotencyMiddleware(app, store, path_prefixes=("/todos",)))
+    for _ in range(2):
+        response = client.post("/auth/login", content=b"username=u", headers={"Idempotency-Key": "abc"})
+        assert "idempotent-replayed" not in response.headers
+
+    assert calls == ["/auth/login", "/auth/login"]
+    assert not store._entries
+
+
+def test_login_tokens_are_not_stored(db_engine, monkeypatch):
+    from src.config import settings
+    from src.main import app
+
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(settings, "ACTIVITY_LOG_ENABLED", False)
+    credentials = {"username": "ann", "password": "secret123"}
+    headers = {"Idempotency-Key": "login-1"}
+
+    with TestClient(app) as client:
+        client.post("/auth/register", json={**credentials, "email": "ann@example.com"})
+        responses = [client.post("/auth/login", data=credentials, headers=headers) for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert all("idempotent-replayed" not in response.headers for response in responses)
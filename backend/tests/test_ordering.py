@@ -0,0 +1,110 @@
+import bisect
+import random
+
+import pytest
+
+from src import database, ordering
+from src.models import Project, Todo, User
+from src.ordering import _validate_key, key_between, keys_between
+
+
+def assert_between(key, a, b):
+    _validate_key(key)
+    assert a is None or a < key
+    assert b is None or key < b
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_inserts_keep_order(seed):
+    rng = random.Random(seed)
+    keys = []
+    for _ in range(2000):
+        i = rng.randint(0, len(keys))
+        a = keys[i - 1] if i > 0 else None
+        b = keys[i] if i < len(keys) else None
+        key = key_between(a, b)
+        assert_between(key, a, b)
+        keys.insert(i, key)
+    assert keys == sorted(set(keys))
+
+
+def test_repeated_appends_and_prepends_cross_integer_lengths():
+    # Walks the integer part across heads, e.g. "Zz" -> "a0" and "a0" -> "Zz"
+    last = first = key_between(None, None)
+    for _ in range(5000):
+        key = key_between(last, None)
+        assert_between(key, last, None)
+        last = key
+        key = key_between(None, first)
+        assert_between(key, None, first)
+        first = key
+    assert len(last) <= 4 and len(first) <= 4
+
+
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_repeated_squeezes_between_neighbours(side):
+    a = key_between(None, None)
+    b = key_between(a, None)
+    for _ in range(500):
+        key = key_between(a, b)
+        assert_between(key, a, b)
+        if side == "left":
+            b = key
+        else:
+            a = key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_keys_between_spreads_increasing_keys(seed):
+    rng = random.Random(seed)
+    bounds = sorted(set(keys_between(None, None, 50)))
+    for _ in range(200):
+        a = rng.choice([None, *bounds])
+        b = rng.choice([None, *bounds])
+        if a is not None and b is not None and a >= b:
+            continue
+        n = rng.randint(0, 40)
+        keys = keys_between(a, b, n)
+        assert len(keys) == n
+        assert keys == sorted(set(keys))
+        for key in keys:
+            assert_between(key, a, b)
+
+
+@pytest.mark.parametrize("a, b", [("a1", "a0"), ("a1", "a1"), ("a10", None), (None, "a"), ("!", None)])
+def test_invalid_bounds_raise(a, b):
+    with pytest.raises(ValueError):
+        key_between(a, b)
+
+
+def test_rebalance_keeps_project_order(db_engine):
+    db = database.SessionLocal()
+    user = User(username="u", email="u@example.com", password="x")
+    db.add(user)
+    db.flush()
+    project = Project(name="p", user_id=user.id)
+    db.add(project)
+    db.flush()
+
+    rng = random.Random(0)
+    keys = []
+    for i in range(200):
+        # Mostly squeezed in after the first todo, so keys grow long
+        index = 1 if keys and rng.random() < 0.8 else len(keys)
+        a = keys[index - 1] if index > 0 else None
+        b = keys[index] if index < len(keys) else None
+        key = key_between(a, b)
+        bisect.insort(keys, key)
+        db.add(Todo(title=f"t{i}", project_id=project.id, user_id=user.id, position=key))
+    db.commit()
+
+    def order():
+        return [todo.title for todo in db.query(Todo).order_by(Todo.position)]
+
+    before = order()
+    updated_at = {todo.id: todo.updated_at for todo in db.query(Todo)}
+    assert ordering.rebalance_project(db, project.id) == 200
+    assert order() == before
+    assert {todo.id: todo.updated_at for todo in db.query(Todo)} == updated_at
+    assert max(len(todo.position) for todo in db.query(Todo)) <= 3
+    db.close()
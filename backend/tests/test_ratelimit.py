@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from src import database
+from src.models import RateLimitBucket
+from src.ratelimit import DatabaseRateLimiter, MemoryRateLimiter
+
+
+@pytest.fixture(params=["memory", "database"])
+def limiter(request, db_engine):
+    return MemoryRateLimiter() if request.param == "memory" else DatabaseRateLimiter()
+
+
+def test_burst_then_wait(limiter):
+    async def run():
+        waits = [await limiter.hit("key", rate=1.0, burst=3) for _ in range(4)]
+        assert waits[:3] == [0, 0, 0]
+        assert 0 < waits[3] <= 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_first_hits_share_one_bucket(db_engine):
+    limiter = DatabaseRateLimiter()
+    locked_bucket = limiter._locked_bucket
+    raced = False
+
+    def locked_bucket_after_race(db, key):
+        # Another worker creates the bucket between this one's lookup and its insert
+        nonlocal raced
+        bucket = locked_bucket(db, key)
+        if bucket is None and not raced:
+            raced = True
+            other = database.SessionLocal()
+            other.add(RateLimitBucket(key=key, tokens=0.0, updated_at=time.time(), full_at=time.time() + 2))
+            other.commit()
+            other.close()
+        return bucket
+
+    limiter._locked_bucket = locked_bucket_after_race
+    assert asyncio.run(limiter.hit("key", rate=1.0, burst=2)) > 0
+
+
+def test_purge_drops_refilled_buckets(db_engine):
+    db = database.SessionLocal()
+    now = time.time()
+    db.add(RateLimitBucket(key="refilled", tokens=0.0, updated_at=now - 10, full_at=now - 5))
+    db.add(RateLimitBucket(key="draining", tokens=0.0, updated_at=now, full_at=now + 5))
+    db.commit()
+
+    asyncio.run(DatabaseRateLimiter().hit("new", rate=1.0, burst=2))
+
+    assert {row.key for row in db.query(RateLimitBucket).all()} == {"draining", "new"}
+    db.close()
+
+
+@pytest.fixture
+def client(db_engine, monkeypatch):
+    from starlette.testclient import TestClient
+
+    from src.config import settings
+    from src.main import app
+
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(settings, "ACTIVITY_LOG_ENABLED", False)
+    with TestClient(app, headers={"Origin": "http://localhost:5173"}) as client:
+        yield client
+
+
+def test_rate_limited_auth_exposes_retry_after(client, monkeypatch):
+    from src.config import settings
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_USER_BURST", 1)
+    credentials = {"username": "limited", "password": "wrong"}
+    responses = [client.post("/auth/login", data=credentials) for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [401, 429]
+    assert int(responses[1].headers["retry-after"]) > 0
+    assert responses[1].headers["access-control-allow-origin"] == "http://localhost:5173"
+    assert "retry-after" in responses[1].headers["access-control-expose-headers"].lower()
+
+
+def test_shed_requests_carry_cors_headers(client):
+    from src.ratelimit import LoadSheddingMiddleware
+
+    client.get("/todos")
+    layer = client.app.middleware_stack
+    while not isinstance(layer, LoadSheddingMiddleware):
+        layer = layer.app
+    layer.in_flight = layer.max_concurrency
+
+    response = client.get("/todos")
+
+    layer.in_flight = 0
+    assert response.status_code == 503
+    assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+    assert "retry-after" in response.headers["access-control-expose-headers"].lower()
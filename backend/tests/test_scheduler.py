@@ -0,0 +1,73 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import database
+from src.models import Project, Todo, User
+from src.scheduler import DueDateScheduler
+
+
+@pytest.fixture
+def session(db_engine):
+    db = database.SessionLocal()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def project(session):
+    user = User(username="u", email="u@example.com", password="x")
+    session.add(user)
+    session.flush()
+    project = Project(name="p", user_id=user.id)
+    session.add(project)
+    session.commit()
+    return project
+
+
+@pytest.fixture
+def leader():
+    scheduler = DueDateScheduler()
+    scheduler.is_leader = True
+    events = []
+    scheduler.subscribe(lambda event: events.append((event.kind, event.todo_id)))
+    return scheduler, events
+
+
+def add_todo(session, project, due_date):
+    todo = Todo(title="t", project_id=project.id, user_id=project.user_id, due_date=due_date)
+    session.add(todo)
+    session.commit()
+    return todo
+
+
+def test_picks_up_todos_added_by_other_workers(session, project, leader):
+    scheduler, events = leader
+    asyncio.run(scheduler._tick())
+
+    # Created through another worker, so this scheduler's track() never saw it
+    todo = add_todo(session, project, datetime.utcnow() + timedelta(minutes=10))
+    asyncio.run(scheduler._tick())
+
+    assert events == [("due", todo.id)]
+
+
+def test_fired_todo_does_not_fire_again_when_updated(session, project, leader):
+    scheduler, events = leader
+    asyncio.run(scheduler._tick())
+    todo = add_todo(session, project, datetime.utcnow() + timedelta(seconds=0.2))
+    scheduler.track(todo)
+    time.sleep(0.3)
+    asyncio.run(scheduler._tick())
+    assert events == [("due", todo.id), ("overdue", todo.id)]
+    assert scheduler.overdue_count(todo.user_id) == 1
+
+    todo.title = "renamed"
+    session.commit()
+    scheduler.track(todo)
+    asyncio.run(scheduler._tick())
+
+    assert len(events) == 2
+    assert scheduler.overdue_count(todo.user_id) == 1
@@ -0,0 +1,92 @@
+import json
+from datetime import datetime
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import inspect
+
+from src import database, schemas
+from src.models import Project, Tag, Todo, User
+from src.serialization import TODO_COLUMNS, apply_todo_fields, parse_fields, serialize_todos
+
+
+@pytest.fixture
+def session(db_engine):
+    db = database.SessionLocal()
+    user = User(username="u", email="u@example.com", password="x")
+    db.add(user)
+    db.flush()
+    projects = [Project(name=f"p{i}", user_id=user.id) for i in range(2)]
+    tags = [Tag(name=f"t{i}", user_id=user.id) for i in range(3)]
+    db.add_all(projects + tags)
+    db.flush()
+    for i in range(4):
+        todo = Todo(
+            title=f"todo {i}", project_id=projects[i % 2].id, user_id=user.id, due_date=datetime(2030, 1, i + 1)
+        )
+        todo.tags = tags[i % 3 : i % 3 + 2]
+        db.add(todo)
+    db.commit()
+    db.expunge_all()
+    yield db
+    db.close()
+
+
+def load(db, fields):
+    return apply_todo_fields(db.query(Todo).order_by(Todo.title), fields).all()
+
+
+def test_parse_fields_always_includes_id():
+    assert parse_fields(None) is None
+    assert parse_fields(" title, project ,,") == {"id", "title", "project"}
+
+
+def test_parse_fields_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("title,password,bogus")
+    assert error.value.status_code == 400
+    assert error.value.detail == "Unknown fields: bogus, password"
+
+
+def test_apply_todo_fields_loads_only_requested_columns(session):
+    todo = load(session, {"id", "title", "project"})[0]
+    state = inspect(todo)
+
+    # project_id comes along to resolve the project
+    assert TODO_COLUMNS - state.unloaded == {"id", "title", "project_id"}
+    assert "project" not in state.unloaded
+    assert "tags" in state.unloaded
+
+
+def test_default_output_matches_response_model(session):
+    todos = load(session, None)
+    adapter = TypeAdapter(List[schemas.TodoWithProject])
+    expected = json.loads(adapter.dump_json(adapter.validate_python(todos, from_attributes=True)))
+
+    assert json.loads(serialize_todos(todos, None)) == expected
+
+
+def test_sparse_output_has_only_requested_keys(session):
+    fields = parse_fields("title,tags")
+    data = json.loads(serialize_todos(load(session, fields), fields))
+
+    assert {key for item in data for key in item} == {"id", "title", "tags"}
+    assert {tag["name"] for tag in data[0]["tags"]} == {"t0", "t1"}
+
+
+def test_sideload_lists_each_relation_once(session):
+    todos = load(session, None)
+    body = json.loads(serialize_todos(todos, None, sideload=True))
+
+    assert set(body) == {"data", "included"}
+    assert set(body["included"]["projects"]) == {todo.project_id for todo in todos}
+    assert set(body["included"]["tags"]) == {tag.id for todo in todos for tag in todo.tags}
+    for item, todo in zip(body["data"], todos):
+        assert "project" not in item and "tags" not in item
+        assert item["project_id"] == todo.project_id
+        assert item["tag_ids"] == [tag.id for tag in todo.tags]
+        assert body["included"]["projects"][item["project_id"]]["name"] == todo.project.name
+    # Side-loaded collections validate as the documented schema
+    schemas.TodoCollection.model_validate(body)